@@ -1,380 +1,513 @@
+import logging
+import warnings
+
+import numpy as np
 import polars as pl
-import random
-from datetime import datetime, timedelta
-
-def construct_facility_map(facilities):
-    """Create a map of risk factors between facility pairs"""
-    res = {}
-    for i in range(len(facilities)):
-        for j in range(len(facilities)):
-            if i != j:
-                # Some facility pairs will be riskier than others
-                res[(facilities[i], facilities[j])] = random.uniform(0.01, 0.05)
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    # numba is optional; without it simulate_excursions is plain Python and
+    # synthesize_data(use_numba=True) falls back to the NumPy path
+    HAS_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+logger = logging.getLogger(__name__)
+
+FACILITIES = [
+    "Johns Hopkins Cell Therapy Lab (Baltimore, MD)",
+    "Cleveland Clinic (Cleveland, OH)",
+    "Mayo Clinic (Rochester, MN)",
+    "MD Anderson (Houston, TX)",
+    "UPenn Cell Therapy Center (Philadelphia, PA)",
+    "Dana-Farber Cancer Institute (Boston, MA)"
+]
+COMPANIES = [
+    "Johns Hopkins Cell Therapy Lab",
+    "Bristol Myers Squibb",
+    "Novartis",
+    "Kit Pharma",
+    "Legend Biotech",
+]
+AIRPORTS = ['BWI', 'IAH', 'JFK', 'CLE', 'ORD']
+CARRIERS = ['Cryoport', 'FedEx Health', 'UPS ColdChain']
+PRODUCT_TYPES = ['Stem Cell', 'CAR-T', 'iPSC-derived']
+
+# Adjustment factors (multiplicative effect - above 1.0 increases risk, below 1.0 decreases risk)
+# Each table is indexed by the position of the value in the lists above
+
+# Carrier risk factors
+CARRIER_FACTOR = np.array([
+    0.7,    # Cryoport: reliable carrier (reduces risk)
+    1.2,    # FedEx Health: average carrier (slightly increases risk)
+    1.0,    # UPS ColdChain: neutral
+])
+
+# Product type risk factors
+PRODUCT_FACTOR = np.array([
+    1.5,    # Stem Cell: most sensitive
+    1.2,    # CAR-T: moderately sensitive
+    0.8,    # iPSC-derived: most stable
+])
+
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+SEASONS = ['winter', 'spring', 'summer', 'fall']
+
+# Day of week risk factors (weekends are riskier), Monday first
+DAY_FACTOR = np.array([0.9, 0.85, 0.8, 0.9, 1.1, 1.3, 1.2])
+
+# Seasonal risk factors: winter, spring, summer, fall
+SEASON_FACTOR = np.array([0.8, 1.0, 1.5, 1.1])
+
+# Season index for each month, January first
+MONTH_TO_SEASON = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0], dtype=np.int8)
+
+# Temperature ranges (°C) for normal readings and excursions
+NORMAL_RANGE = (-80, -60)
+EXCURSION_RANGE = (-59, -50)
+
+# ISO 8601 UTC format for the timestamp columns
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+def construct_facility_map(rng, facilities):
+    """Create a matrix of risk factors between facility pairs, indexed [origin, destination]"""
+    # Some facility pairs will be riskier than others
+    res = rng.uniform(0.01, 0.05, size=(len(facilities), len(facilities)))
+    # A facility never ships to itself
+    np.fill_diagonal(res, 0.0)
     return res
 
-def get_season(date):
-    """Determine season from date"""
-    month = date.month
-    if month in [12, 1, 2]:
-        return "winter"
-    elif month in [3, 4, 5]:
-        return "spring"
-    elif month in [6, 7, 8]:
-        return "summer"
-    else:
-        return "fall"
+def draw_distinct_pairs(rng, k, n):
+    """Draw n index pairs from range(k) where the second index never equals the first"""
+    first = rng.integers(0, k, size=n, dtype=np.int8)
+    # A non-zero offset modulo k always lands on a different index
+    second = (first + rng.integers(1, k, size=n, dtype=np.int8)) % k
+    return first, second
+
+def construct_airport_matrix(airports):
+    """Create a symmetric matrix of risk factors between airport pairs"""
+    # Some pairs are riskier, in either direction
+    airport_risk_map = {
+        ('JFK', 'IAH'): 1.2,
+        ('ORD', 'JFK'): 1.3,
+        ('BWI', 'IAH'): 0.9,
+        ('CLE', 'JFK'): 1.1,
+        ('IAH', 'ORD'): 1.2
+    }
+    res = np.ones((len(airports), len(airports)))
+    for (dep, arr), factor in airport_risk_map.items():
+        i, j = airports.index(dep), airports.index(arr)
+        res[i, j] = res[j, i] = factor
+    return res
 
-def get_day_of_week(date):
-    """Get day of week from date"""
-    return date.strftime("%A")
+# Built once; the probability code only gathers from it
+AIRPORT_RISK = construct_airport_matrix(AIRPORTS)
+
+def get_season(times):
+    """Determine season index (into SEASONS) of each datetime64 value"""
+    return MONTH_TO_SEASON[times.astype('datetime64[M]').astype(np.int64) % 12]
+
+def get_day_of_week(times):
+    """Get day of week index (Monday = 0) of each datetime64 value"""
+    # 1970-01-01 was a Thursday
+    return ((times.astype('datetime64[D]').astype(np.int64) + 3) % 7).astype(np.int8)
 
 def calculate_excursion_probability(
-    facility_pair,
-    facility_map,
-    carrier,
-    product_type,
+    origin_idx,
+    dest_idx,
+    facility_risk,
+    carrier_idx,
+    product_idx,
     day_of_week,
     season,
     delay_minutes,
-    airport_pair,
+    dep_idx,
+    arr_idx,
     flight_duration,
     had_customs_hold,
     shipment_duration,
     base_prob
 ):
-    """Calculate probability of temperature excursion based on risk factors"""    
-    # Adjustment factors (multiplicative effect - above 1.0 increases risk, below 1.0 decreases risk)
-    
+    """Calculate probability of temperature excursion for every shipment at once"""
     # Facility pair risk factor
-    facility_factor = 1.0 + facility_map.get(facility_pair, 0.02)
-    
-    # Carrier risk factors
-    carrier_factor = {
-        'Cryoport': 0.7,             # Reliable carrier (reduces risk)
-        'FedEx Health': 1.2,         # Average carrier (slightly increases risk)
-        'UPS ColdChain': 1.0         # Neutral
-    }.get(carrier, 1.0)
-    
-    # Product type risk factors
-    product_factor = {
-        'Stem Cell': 1.5,            # Most sensitive
-        'CAR-T': 1.2,                # Moderately sensitive
-        'iPSC-derived': 0.8          # Most stable
-    }.get(product_type, 1.0)
-    
-    # Day of week risk factors (weekends are riskier)
-    day_factor = {
-        'Monday': 0.9,
-        'Tuesday': 0.85,
-        'Wednesday': 0.8,
-        'Thursday': 0.9,
-        'Friday': 1.1,
-        'Saturday': 1.3,
-        'Sunday': 1.2
-    }.get(day_of_week, 1.0)
-    
-    # Seasonal risk factors
-    season_factor = {
-        'winter': 0.8,
-        'spring': 1.0,
-        'summer': 1.5,
-        'fall': 1.1
-    }.get(season, 1.0)
-    
+    facility_factor = 1.0 + facility_risk[origin_idx, dest_idx]
+
     # Delay risk factor (longer delays = higher risk)
     # No delay: 1.0x, 1 hour delay: ~1.2x, 3 hour delay: ~1.6x
     delay_factor = 1.0 + (delay_minutes / 300)
-    
+
     # Airport pair risk (some pairs are riskier)
-    airport_risk_map = {
-        ('JFK', 'IAH'): 1.2,
-        ('ORD', 'JFK'): 1.3,
-        ('BWI', 'IAH'): 0.9,
-        ('CLE', 'JFK'): 1.1,
-        ('IAH', 'ORD'): 1.2
-    }
-    airport_factor = airport_risk_map.get(airport_pair, 1.0)
-    # Try the reverse pair if not found
-    if airport_pair not in airport_risk_map:
-        airport_factor = airport_risk_map.get((airport_pair[1], airport_pair[0]), 1.0)
-    
+    airport_factor = AIRPORT_RISK[dep_idx, arr_idx]
+
     # Flight duration factor (longer flights = higher risk)
     # 1.5hr flight: ~1.1x, 3hr flight: ~1.2x, 4.5hr flight: ~1.3x
     flight_duration_factor = 1.0 + (flight_duration / 20)
-    
+
     # Customs hold factor - major risk increase
-    customs_factor = 1.8 if had_customs_hold else 1.0
-    
+    customs_factor = np.where(had_customs_hold, 1.8, 1.0)
+
     # Shipment duration factor (longer shipments = higher risk)
     # 8hr: ~1.1x, 24hr: ~1.3x, 48hr: ~1.6x
     shipment_duration_factor = 1.0 + (shipment_duration / 120)
-    
+
     # Calculate final probability by applying all factors to base probability
     # Each factor multiplies the risk
-    final_prob = base_prob
-    final_prob *= facility_factor
-    final_prob *= carrier_factor
-    final_prob *= product_factor
-    final_prob *= day_factor
-    final_prob *= season_factor
-    final_prob *= delay_factor
-    final_prob *= airport_factor
-    final_prob *= flight_duration_factor
-    final_prob *= customs_factor
-    final_prob *= shipment_duration_factor
-    
+    final_prob = (
+        base_prob
+        * facility_factor
+        * CARRIER_FACTOR[carrier_idx]
+        * PRODUCT_FACTOR[product_idx]
+        * DAY_FACTOR[day_of_week]
+        * SEASON_FACTOR[season]
+        * delay_factor
+        * airport_factor
+        * flight_duration_factor
+        * customs_factor
+        * shipment_duration_factor
+    )
+
     # Cap the probability at 0.95
-    return min(0.95, final_prob)
+    return np.minimum(0.95, final_prob)
+
+def generate_temperature(rng, excursion_prob, normal_range=NORMAL_RANGE, excursion_range=EXCURSION_RANGE):
+    """Generate one temperature per entry of an array of excursion probabilities"""
+    size = len(excursion_prob)
+    is_excursion = rng.random(size) <= excursion_prob
+    # Excursion temperatures sit above -60°C, normal ones below
+    excursion = rng.uniform(*excursion_range, size=size)
+    normal = rng.uniform(*normal_range, size=size)
+    return np.round(np.where(is_excursion, excursion, normal), 2)
+
+@njit(parallel=True, cache=True)
+def simulate_excursions(
+    origin_idx,
+    dest_idx,
+    facility_risk,
+    carrier_idx,
+    product_idx,
+    day_of_week,
+    season,
+    delay_minutes,
+    dep_idx,
+    arr_idx,
+    flight_duration,
+    had_customs_hold,
+    shipment_duration,
+    base_prob,
+    carrier_factor,
+    product_factor,
+    day_factor,
+    season_factor,
+    airport_risk,
+    reading_start,
+    reading_count,
+    excursion_draw,
+    excursion_temperature,
+    normal_temperature
+):
+    """Loop-style kernel fusing calculate_excursion_probability and generate_temperature
+
+    Compiled with numba when it is installed. The random draws for every reading are
+    passed in, so this returns the same probabilities, temperatures and per-shipment
+    excursion flags as the NumPy path for the same draws.
+    """
+    n = len(origin_idx)
+    excursion_prob = np.empty(n)
+    temperatures = np.empty(len(excursion_draw))
+    had_excursion = np.zeros(n, dtype=np.bool_)
+
+    for i in prange(n):
+        prob = (
+            base_prob
+            * (1.0 + facility_risk[origin_idx[i], dest_idx[i]])
+            * carrier_factor[carrier_idx[i]]
+            * product_factor[product_idx[i]]
+            * day_factor[day_of_week[i]]
+            * season_factor[season[i]]
+            * (1.0 + delay_minutes[i] * (1.0 / 300))
+            * airport_risk[dep_idx[i], arr_idx[i]]
+            * (1.0 + flight_duration[i] * (1.0 / 20))
+            * (1.0 + shipment_duration[i] * (1.0 / 120))
+        )
+        if had_customs_hold[i]:
+            prob *= 1.8
+        prob = min(0.95, prob)
+        excursion_prob[i] = prob
+
+        count = reading_count[i]
+        for j in range(count):
+            k = reading_start[i] + j
+            # Higher chance of excursion in middle of journey
+            journey_factor = 1.2 if count // 4 < j < 3 * count // 4 else 1.0
+            if excursion_draw[k] <= prob * journey_factor:
+                temperature = np.round(excursion_temperature[k], 2)
+            else:
+                temperature = np.round(normal_temperature[k], 2)
+            temperatures[k] = temperature
+            if temperature > -60:
+                had_excursion[i] = True
+
+    return excursion_prob, temperatures, had_excursion
+
+def decode_codes(codes, values):
+    """Expand an array of integer codes into a Polars Enum column over values"""
+    return pl.Series(values, dtype=pl.Enum(values)).gather(codes)
+
+def to_datetime_series(times):
+    """Wrap an array of datetime64[s] values as a Polars Datetime series"""
+    # Polars has no seconds resolution, so widen to milliseconds
+    return pl.Series(times.astype('datetime64[ms]'))
+
+def synthesize_data(n=1000, base_excursion_rate=0.1, use_numba=False, seed=None, lazy=False):
+    if use_numba and not HAS_NUMBA:
+        warnings.warn("numba is not installed; using the NumPy implementation", RuntimeWarning, stacklevel=2)
+        use_numba = False
+
+    # One generator for every draw; pass a seed for reproducible data
+    rng = np.random.Generator(np.random.PCG64(seed))
+
+    facility_risk = construct_facility_map(rng, FACILITIES)
 
-def generate_temperature(excursion_prob, normal_range=(-80, -60), excursion_range=(-59, -50)):
-    """Generate a temperature based on excursion probability"""
-    if random.random() <= excursion_prob:
-        # Generate an excursion temperature (above -60°C)
-        return round(random.uniform(*excursion_range), 2)
+    facilities_arr = np.array(FACILITIES, dtype=object)
+    airports_arr = np.array(AIRPORTS, dtype=object)
+
+    shipment_ids = np.char.mod("SHP%04d", np.arange(n))
+
+    # -- ROUTE TABLE --
+    # Draw every shipment attribute at once as an array of int8 codes into the value
+    # lists; they are only expanded to strings when the tables are built
+    origin_idx, dest_idx = draw_distinct_pairs(rng, len(FACILITIES), n)
+    carrier_idx = rng.integers(0, len(CARRIERS), size=n, dtype=np.int8)
+    product_idx = rng.integers(0, len(PRODUCT_TYPES), size=n, dtype=np.int8)
+    company_idx = rng.integers(0, len(COMPANIES), size=n, dtype=np.int8)
+
+    # Generate dates
+    start_offsets = rng.integers(0, 365, size=n)
+    start_time = np.datetime64('2024-01-01T00:00:00') + start_offsets.astype('timedelta64[D]').astype('timedelta64[s]')
+    shipment_duration_hours = rng.integers(8, 49, size=n)
+    end_time = start_time + (shipment_duration_hours * 3600).astype('timedelta64[s]')
+
+    # -- FLIGHT TABLE --
+    dep_idx, arr_idx = draw_distinct_pairs(rng, len(AIRPORTS), n)
+    scheduled_departure = start_time + np.timedelta64(2, 'h')
+    delay_minutes = rng.integers(0, 181, size=n)  # 0-3 hours delay
+    actual_departure = scheduled_departure + (delay_minutes * 60).astype('timedelta64[s]')
+    flight_duration_hours = rng.uniform(1.5, 4.5, size=n)  # 1.5-4.5 hours
+    arrival_time = actual_departure + (flight_duration_hours * 3600).astype('timedelta64[s]')
+    flight_numbers = np.char.add("FX", rng.integers(1000, 10000, size=n).astype(str))
+
+    # Random customs hold
+    had_customs_hold = rng.random(n) < 0.1  # 10% chance of customs hold
+
+    # Get day of week and season
+    day_idx = get_day_of_week(start_time)
+    season_idx = get_season(start_time)
+
+    # -- EVENT TABLE --
+    pickup_time = start_time
+    in_transit_time = start_time + (shipment_duration_hours * 1800).astype('timedelta64[s]')
+    delivery_time = end_time
+    customs_delay_hours = flight_duration_hours + rng.uniform(0.5, 2, size=n)
+    customs_time = actual_departure + (customs_delay_hours * 3600).astype('timedelta64[s]')
+
+    # Pickup, in-transit and delivery events for every shipment, interleaved
+    event_shipment = np.repeat(np.arange(n), 3)
+    event_time = np.empty(3 * n, dtype='datetime64[s]')
+    event_time[0::3] = pickup_time
+    event_time[1::3] = in_transit_time
+    event_time[2::3] = delivery_time
+    event_type = np.tile(np.array(["pickup", "in_transit", "delivery"], dtype=object), n)
+    destination_facility = facilities_arr[dest_idx]
+    event_location = np.empty(3 * n, dtype=object)
+    event_location[0::3] = facilities_arr[origin_idx]
+    event_location[1::3] = "En route to " + destination_facility
+    event_location[2::3] = destination_facility
+
+    # Add customs event if applicable, placed after the shipment's delivery event
+    customs = np.flatnonzero(had_customs_hold)
+    event_shipment = np.concatenate([event_shipment, customs])
+    order = np.argsort(event_shipment, kind='stable')
+    event_shipment = event_shipment[order]
+    event_time = np.concatenate([event_time, customs_time[customs]])[order]
+    event_type = np.concatenate([event_type, np.full(len(customs), "customs_hold", dtype=object)])[order]
+    event_location = np.concatenate([event_location, airports_arr[arr_idx[customs]]])[order]
+
+    # -- TEMPERATURE TABLE --
+    # More frequent temperature readings
+    reading_count = np.maximum(6, shipment_duration_hours // 4)  # At least 6 readings
+    reading_start = np.cumsum(reading_count) - reading_count
+    # Shipment of each reading and the reading's position within its shipment
+    reading_shipment = np.repeat(np.arange(n), reading_count)
+    reading_index = np.arange(reading_count.sum()) - reading_start[reading_shipment]
+    count = reading_count[reading_shipment]
+    duration = shipment_duration_hours[reading_shipment]
+    reading_time = start_time[reading_shipment] + np.round(reading_index * (duration / count) * 3600).astype('timedelta64[s]')
+
+    if use_numba:
+        # Same model as below in one fused pass per shipment
+        total_readings = len(reading_shipment)
+        excursion_probability, temperatures, had_excursion = simulate_excursions(
+            origin_idx,
+            dest_idx,
+            facility_risk,
+            carrier_idx,
+            product_idx,
+            day_idx,
+            season_idx,
+            delay_minutes,
+            dep_idx,
+            arr_idx,
+            flight_duration_hours,
+            had_customs_hold,
+            shipment_duration_hours,
+            base_excursion_rate,
+            CARRIER_FACTOR,
+            PRODUCT_FACTOR,
+            DAY_FACTOR,
+            SEASON_FACTOR,
+            AIRPORT_RISK,
+            reading_start,
+            reading_count,
+            rng.random(total_readings),
+            rng.uniform(*EXCURSION_RANGE, size=total_readings),
+            rng.uniform(*NORMAL_RANGE, size=total_readings)
+        )
     else:
-        # Generate a normal temperature
-        return round(random.uniform(*normal_range), 2)
-
-def synthesize_data(n=1000, base_excursion_rate=0.1):
-    facilities = [
-        "Johns Hopkins Cell Therapy Lab (Baltimore, MD)",
-        "Cleveland Clinic (Cleveland, OH)",
-        "Mayo Clinic (Rochester, MN)",
-        "MD Anderson (Houston, TX)",
-        "UPenn Cell Therapy Center (Philadelphia, PA)",
-        "Dana-Farber Cancer Institute (Boston, MA)"
-    ]
-    companies = [
-        "Johns Hopkins Cell Therapy Lab",
-        "Bristol Myers Squibb",
-        "Novartis",
-        "Kit Pharma",
-        "Legend Biotech",
-    ]
-    airports = ['BWI', 'IAH', 'JFK', 'CLE', 'ORD']
-    carriers = ['Cryoport', 'FedEx Health', 'UPS ColdChain']
-    product_types = ['Stem Cell', 'CAR-T', 'iPSC-derived']
-
-    facility_map = construct_facility_map(facilities)
-
-    shipment_routes = []
-    shipment_flights = []
-    shipment_events = []
-    shipment_temperatures = []
-    
-    # Track shipments with excursions for analysis
-    shipments_with_excursions = set()
-
-    for i in range(n):
-        shipment_id = f"SHP{i:04}"
-        
-        # -- ROUTE TABLE --
-        origin_facility = random.choice(facilities)
-        destination_facility = random.choice([f for f in facilities if f != origin_facility])
-        carrier = random.choice(carriers)
-        product_type = random.choice(product_types)
-        company = random.choice(companies)
-        
-        # Generate dates
-        start_time = datetime(2024, 1, 1) + timedelta(days=random.randint(0, 364))
-        shipment_duration_hours = random.randint(8, 48)
-        end_time = start_time + timedelta(hours=shipment_duration_hours)
-        
-        # Get day of week and season
-        day_of_week = get_day_of_week(start_time)
-        season = get_season(start_time)
-        
-        # -- FLIGHT TABLE --
-        dep_airport = random.choice(airports)
-        arr_airport = random.choice([a for a in airports if a != dep_airport])
-        scheduled_departure = start_time + timedelta(hours=2)
-        delay_minutes = random.randint(0, 180)  # 0-3 hours delay
-        actual_departure = scheduled_departure + timedelta(minutes=delay_minutes)
-        flight_duration_hours = random.uniform(1.5, 4.5)  # 1.5-4.5 hours
-        arrival_time = actual_departure + timedelta(hours=flight_duration_hours)
-        
-        # Random customs hold
-        had_customs_hold = random.random() < 0.1  # 10% chance of customs hold
-        
         # Calculate excursion probability based on all factors
-        excursion_prob = calculate_excursion_probability(
-            (origin_facility, destination_facility),
-            facility_map,
-            carrier,
-            product_type,
-            day_of_week,
-            season,
+        excursion_probability = calculate_excursion_probability(
+            origin_idx,
+            dest_idx,
+            facility_risk,
+            carrier_idx,
+            product_idx,
+            day_idx,
+            season_idx,
             delay_minutes,
-            (dep_airport, arr_airport),
+            dep_idx,
+            arr_idx,
             flight_duration_hours,
             had_customs_hold,
             shipment_duration_hours,
             base_excursion_rate
         )
-        
-        # Add to routes table (without status column)
-        shipment_routes.append([
-            shipment_id,
-            company,
-            origin_facility,
-            destination_facility,
-            start_time.date().isoformat(),
-            end_time.isoformat(),
-            carrier,
-            product_type,
-            delay_minutes,
-            had_customs_hold,
-            day_of_week,
-            season,
-            round(excursion_prob, 4)  # Store the calculated probability for validation
-        ])
-
-        # -- EVENT TABLE --
-        pickup_time = start_time
-        in_transit_time = start_time + timedelta(hours=shipment_duration_hours / 2)
-        delivery_time = end_time
-
-        events = [
-            [shipment_id, pickup_time.isoformat() + 'Z', "pickup", origin_facility],
-            [shipment_id, in_transit_time.isoformat() + 'Z', "in_transit", f"En route to {destination_facility}"],
-            [shipment_id, delivery_time.isoformat() + 'Z', "delivery", destination_facility],
-        ]
-        
-        # Add customs event if applicable
-        if had_customs_hold:
-            customs_time = actual_departure + timedelta(hours=flight_duration_hours + random.uniform(0.5, 2))
-            events.append([shipment_id, customs_time.isoformat() + 'Z', "customs_hold", arr_airport])
-            
-        shipment_events.extend(events)
-
-        # Add to flights table
-        shipment_flights.append([
-            shipment_id,
-            f"FX{random.randint(1000, 9999)}",
-            dep_airport,
-            arr_airport,
-            scheduled_departure.isoformat() + 'Z',
-            actual_departure.isoformat() + 'Z',
-            delay_minutes,
-            arrival_time.isoformat() + 'Z',
-            round(flight_duration_hours, 2)  # Adding flight duration to table
-        ])
-
-        # -- TEMPERATURE TABLE --
-        temp_start = start_time
-        # More frequent temperature readings
-        reading_count = max(6, shipment_duration_hours // 4)  # At least 6 readings
-        
-        had_excursion_in_readings = False
-        
-        for j in range(reading_count):
-            ts = temp_start + timedelta(hours=j * (shipment_duration_hours / reading_count))
-            
-            # Vary excursion probability through shipment journey
-            # Higher chance of excursion in middle of journey
-            journey_factor = 1.0
-            if j > reading_count // 4 and j < 3 * reading_count // 4:
-                journey_factor = 1.2  # Higher risk in middle of journey
-                
-            # Generate temperature based on probability
-            temperature = generate_temperature(excursion_prob * journey_factor)
-
-            print(temperature)
-            # BOOKMARK
-            
-            # Track if this shipment had an excursion
-            if temperature > -60:
-                had_excursion_in_readings = True
-                
-            shipment_temperatures.append([
-                shipment_id,
-                ts.isoformat() + 'Z',
-                temperature
-            ])
-        
-        # Track shipments with excursions for later analysis
-        if had_excursion_in_readings:
-            shipments_with_excursions.add(shipment_id)
-
-    # Convert to Polars DataFrames
-    df_routes = pl.DataFrame(
-        shipment_routes,
-        schema=[
-            "shipment_id", "company", "origin_facility", "destination_facility",
-            "start_time", "end_time", "carrier", "product_type", 
-            "delay_minutes", "had_customs_hold", "day_of_week", "season", "excursion_probability"
-        ],
-        orient="row"
-    )
 
-    df_flights = pl.DataFrame(
-        shipment_flights,
-        schema=[
-            "shipment_id", "flight_number", "departure_airport", "arrival_airport",
-            "scheduled_departure", "actual_departure", "delay_minutes", "arrival_time", "flight_duration_hours"
-        ],
-        orient="row"
-    )
+        # Vary excursion probability through shipment journey
+        # Higher chance of excursion in middle of journey
+        journey_factor = np.where((reading_index > count // 4) & (reading_index < 3 * count // 4), 1.2, 1.0)
 
-    df_events = pl.DataFrame(
-        shipment_events,
-        schema=["shipment_id", "timestamp", "event_type", "location"],
-        orient="row"
-    )
+        # Generate temperature based on probability
+        temperatures = generate_temperature(rng, excursion_probability[reading_shipment] * journey_factor)
+
+        # Flag shipments with any excursion reading for later analysis
+        had_excursion = np.logical_or.reduceat(temperatures > -60, reading_start)
 
-    df_temperatures = pl.DataFrame(
-        shipment_temperatures,
-        schema=["shipment_id", "timestamp", "temperature_c"],
-        orient="row"
+    # Formatting every reading is expensive, so only do it when debug logging is on
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Generated %d temperature readings: %s", len(temperatures), temperatures)
+
+    # Convert to Polars queries; string formatting runs when they are collected or sunk
+    lf_routes = pl.LazyFrame({
+        "shipment_id": shipment_ids,
+        "company": decode_codes(company_idx, COMPANIES),
+        "origin_facility": decode_codes(origin_idx, FACILITIES),
+        "destination_facility": decode_codes(dest_idx, FACILITIES),
+        "start_time": pl.Series(start_time.astype('datetime64[D]')),
+        "end_time": to_datetime_series(end_time),
+        "carrier": decode_codes(carrier_idx, CARRIERS),
+        "product_type": decode_codes(product_idx, PRODUCT_TYPES),
+        "delay_minutes": delay_minutes,
+        "had_customs_hold": had_customs_hold,
+        "day_of_week": decode_codes(day_idx, DAYS_OF_WEEK),
+        "season": decode_codes(season_idx, SEASONS),
+        "excursion_probability": np.round(excursion_probability, 4),  # Store the calculated probability for validation
+        "had_excursion": had_excursion
+    })
+
+    lf_flights = pl.LazyFrame({
+        "shipment_id": shipment_ids,
+        "flight_number": flight_numbers,
+        "departure_airport": decode_codes(dep_idx, AIRPORTS),
+        "arrival_airport": decode_codes(arr_idx, AIRPORTS),
+        "scheduled_departure": to_datetime_series(scheduled_departure),
+        "actual_departure": to_datetime_series(actual_departure),
+        "delay_minutes": delay_minutes,
+        "arrival_time": to_datetime_series(arrival_time),
+        "flight_duration_hours": np.round(flight_duration_hours, 2)  # Adding flight duration to table
+    }).with_columns(
+        pl.col("scheduled_departure", "actual_departure", "arrival_time").dt.strftime(TIMESTAMP_FORMAT)
     )
 
-    return df_routes, df_flights, df_events, df_temperatures, shipments_with_excursions
+    lf_events = pl.LazyFrame({
+        "shipment_id": shipment_ids[event_shipment],
+        "timestamp": to_datetime_series(event_time),
+        "event_type": pl.Series(event_type, dtype=pl.String),
+        "location": pl.Series(event_location, dtype=pl.String)
+    }).with_columns(pl.col("timestamp").dt.strftime(TIMESTAMP_FORMAT))
 
-# Generate data
-routes, flights, events, temps, excursion_shipments = synthesize_data(n=1000, base_excursion_rate=0.01)
+    lf_temperatures = pl.LazyFrame({
+        "shipment_id": shipment_ids[reading_shipment],
+        "timestamp": to_datetime_series(reading_time),
+        "temperature_c": temperatures
+    }).with_columns(pl.col("timestamp").dt.strftime(TIMESTAMP_FORMAT))
 
-# Save to CSV
-routes.write_csv("data/shipment_routes.csv")
-flights.write_csv("data/shipment_flights.csv")
-events.write_csv("data/shipment_events.csv")
-temps.write_csv("data/shipment_temperatures.csv")
+    frames = [lf_routes, lf_flights, lf_events, lf_temperatures]
+    if not lazy:
+        frames = pl.collect_all(frames)
 
-# Optional: Print some statistics to confirm model is working as expected
-excursion_count = len(excursion_shipments)
-total_count = routes.height
-print(f"Total shipments: {total_count}")
-print(f"Shipments with temperature excursions: {excursion_count} ({excursion_count/total_count*100:.2f}%)")
+    return tuple(frames)
 
-# Create a function to calculate excursion rates by factor
-def calculate_excursion_rates(df, column_name, excursion_set):
+def calculate_excursion_rates(df, column_name):
+    """Print the share of shipments with an excursion for each value of a column"""
     print(f"\nExcursion rates by {column_name}:")
-    for value in sorted(df[column_name].unique().to_list()):
-        rows = df.filter(pl.col(column_name) == value)
-        shipment_ids = rows["shipment_id"].to_list()
-        total = len(shipment_ids)
-        excursions = sum(1 for sid in shipment_ids if sid in excursion_set)
-        if total > 0:
-            print(f"  {value}: {excursions/total*100:.2f}% ({excursions}/{total})")
-
-# Check excursion rates by various factors
-calculate_excursion_rates(routes, "carrier", excursion_shipments)
-calculate_excursion_rates(routes, "season", excursion_shipments)
-calculate_excursion_rates(routes, "day_of_week", excursion_shipments)
-calculate_excursion_rates(routes, "had_customs_hold", excursion_shipments)
-calculate_excursion_rates(routes, "product_type", excursion_shipments)
-
-# Calculate average excursion probability
-print(f"\nAverage calculated excursion probability: {routes['excursion_probability'].mean():.4f}")
-print(f"Actual excursion rate: {excursion_count/total_count:.4f}")
-
-# Calculate average delay for shipments with and without excursions
-if excursion_count > 0 and excursion_count < total_count:
-    excursion_shipment_rows = routes.filter(pl.col("shipment_id").is_in(list(excursion_shipments)))
-    non_excursion_shipment_rows = routes.filter(~pl.col("shipment_id").is_in(list(excursion_shipments)))
-
-    avg_delay_with_excursion = excursion_shipment_rows["delay_minutes"].mean()
-    avg_delay_without_excursion = non_excursion_shipment_rows["delay_minutes"].mean()
-
-    print(f"\nAverage delay minutes:")
-    print(f"  Shipments with excursions: {avg_delay_with_excursion:.2f} minutes")
-    print(f"  Shipments without excursions: {avg_delay_without_excursion:.2f} minutes")
\ No newline at end of file
+    stats = (
+        df.group_by(column_name)
+        .agg(pl.len().alias("total"), pl.col("had_excursion").sum().alias("excursions"))
+        .sort(column_name)
+    )
+    for value, total, excursions in stats.iter_rows():
+        print(f"  {value}: {excursions/total*100:.2f}% ({excursions}/{total})")
+
+if __name__ == "__main__":
+    # Generate data
+    routes, flights, events, temps = synthesize_data(n=1000, base_excursion_rate=0.01, lazy=True)
+
+    # Stream to CSV without materializing the formatted tables
+    # (the excursion flag is derived from the temperatures, so it stays out of the routes file)
+    routes.drop("had_excursion").sink_csv("data/shipment_routes.csv", datetime_format="%Y-%m-%dT%H:%M:%S")
+    flights.sink_csv("data/shipment_flights.csv")
+    events.sink_csv("data/shipment_events.csv")
+    temps.sink_csv("data/shipment_temperatures.csv")
+
+    routes = routes.collect()
+
+    # Optional: Print some statistics to confirm model is working as expected
+    excursion_count = routes["had_excursion"].sum()
+    total_count = routes.height
+    print(f"Total shipments: {total_count}")
+    print(f"Shipments with temperature excursions: {excursion_count} ({excursion_count/total_count*100:.2f}%)")
+
+    # Check excursion rates by various factors
+    calculate_excursion_rates(routes, "carrier")
+    calculate_excursion_rates(routes, "season")
+    calculate_excursion_rates(routes, "day_of_week")
+    calculate_excursion_rates(routes, "had_customs_hold")
+    calculate_excursion_rates(routes, "product_type")
+
+    # Calculate average excursion probability
+    print(f"\nAverage calculated excursion probability: {routes['excursion_probability'].mean():.4f}")
+    print(f"Actual excursion rate: {excursion_count/total_count:.4f}")
+
+    # Calculate average delay for shipments with and without excursions
+    if excursion_count > 0 and excursion_count < total_count:
+        avg_delays = dict(routes.group_by("had_excursion").agg(pl.col("delay_minutes").mean()).iter_rows())
+
+        avg_delay_with_excursion = avg_delays[True]
+        avg_delay_without_excursion = avg_delays[False]
+
+        print(f"\nAverage delay minutes:")
+        print(f"  Shipments with excursions: {avg_delay_with_excursion:.2f} minutes")
+        print(f"  Shipments without excursions: {avg_delay_without_excursion:.2f} minutes")